@@ -2,6 +2,8 @@ import Rhino as rh
 import rhinoscriptsyntax as rs
 import scriptcontext as sc
 import json, copy, random, math, os, glob, sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from rhino_dfn_geometry import frame_vertices, unit_rectangle
 
 
 def intersections():
@@ -68,13 +70,12 @@ class EllipsoidFracture:
 
 
 class RectangleFracture(EllipsoidFracture):
-    def draw(self):
-        plane = rs.PlaneFromNormal(rs.coerce3dpoint(self.center), self.nv)
-        p1 = rs.coerce3dpoint(self.center+self.sv1+self.sv2)
-        p2 = rs.coerce3dpoint(self.center-self.sv1-self.sv2)
-        p3 = rs.coerce3dpoint(self.center+self.sv1-self.sv2)
-        p4 = rs.coerce3dpoint(self.center-self.sv1+self.sv2)
-        pts = [p1,p4,p2,p3,p1]
+    def draw(self, corners=None):
+        """Corners counter-clockwise as in unit_rectangle, computed here if not given."""
+        if corners is None:
+            corners = frame_vertices([self.center], [self.sv1], [self.sv2], unit_rectangle)[0]
+        pts = [rh.Geometry.Point3d(*c) for c in corners]
+        pts.append(pts[0])
         draw_rectangle(pts)
         for pt in pts[0:-1]:
             sc.doc.Objects.AddPoint(pt)
@@ -89,9 +90,18 @@ class FractureSet:
         return self.f[i]
     def __len__(self):
         return len(self.f)
+    def corners(self):
+        """Corners of all rectangle fractures in set order."""
+        rects = [f for f in self.f if isinstance(f, RectangleFracture)]
+        return frame_vertices([f.center for f in rects], [f.sv1 for f in rects],
+                              [f.sv2 for f in rects], unit_rectangle)
     def draw(self):
+        corners = iter(self.corners())
         for f in self.f:
-            f.draw()
+            if isinstance(f, RectangleFracture):
+                f.draw(next(corners))
+            else:
+                f.draw()
     def minmax_centers(self):
         m = sys.float_info.max
         mincomps = rh.Geometry.Point3d(m,m,m)
@@ -6,6 +6,61 @@ import copy
 import random
 import math
 import os
+import sys
+import threading
+import traceback
+import Queue
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from rhino_dfn_geometry import perimeter_vertices
+
+
+class report_writer:
+    """
+    Writes realization reports on a background thread while the next
+    realization is generated. At most depth realizations are queued or
+    being written, which bounds the reports held in memory.
+    """
+    def __init__(self, depth=2):
+        self.queue = Queue.Queue()
+        self.slots = threading.BoundedSemaphore(max(depth, 1))
+        self.errors = []
+        self.thread = threading.Thread(target=self._run)
+        self.thread.daemon = True
+        self.thread.start()
+    def _run(self):
+        while 1:
+            job = self.queue.get()
+            if job is None:
+                break
+            args, kwargs = job
+            if not self.errors: # drain but skip reports after first error
+                try:
+                    freport(*args, **kwargs)
+                except Exception:
+                    self.errors.append(sys.exc_info())
+            self.slots.release()
+    def raise_error(self):
+        """Prints writer thread traceback of first error, re-raises its exception."""
+        traceback.print_exception(*self.errors[0])
+        raise self.errors[0][1]
+    def put(self, *args, **kwargs):
+        """Blocks while the writer is depth realizations behind."""
+        if self.errors:
+            self.raise_error()
+        self.slots.acquire()
+        self.queue.put((args, kwargs))
+    def close(self, reraise=True):
+        """
+        Waits for all queued reports. Re-raises first writer error if reraise,
+        only prints writer tracebacks otherwise, eg while another exception propagates.
+        """
+        self.queue.put(None)
+        self.thread.join()
+        if self.errors:
+            if reraise:
+                self.raise_error()
+            for e in self.errors:
+                traceback.print_exception(*e)
 
 
 class srfc_guids:
@@ -180,11 +235,6 @@ def fracture_surface(perim):
     return srf_id
 
 
-def perimeter_pts(perim_id, ptsno):
-    """Places points in equidistance segments along circular perimeter."""
-    return rs.DivideCurve(perim_id, ptsno, create_points=True)
-
-
 def uniform_centers_normals(radii, edge_length, midpt, perim_dist_min):
     """Generates centers and normals such that no two perimeter curves are closer than perim_dist_min."""
     origin, hel = rh.Geometry.Point3d(0,0,0), edge_length/2.
@@ -221,24 +271,23 @@ def uniform_centers_normals(radii, edge_length, midpt, perim_dist_min):
 def populate(radii, centers, unorms, perimpts=0, polygon=False):
     """Generates circle and surface objects on dedicated layers, name hardcoded here."""
     lnames, srf_ids, perim_ids = [], [], []
+    if perimpts:
+        pverts = perimeter_vertices(radii, centers, unorms, perimpts)
     for i in range(len(radii)):
         lname = 'FRACTURE{:0>5d}_S'.format(i)
         lnames += [lname]
         #layer('PERIMS')
         layer(lname)
-        plane = rs.PlaneFromNormal(centers[i], unorms[i])
-        perim, perim_id = fracture_perimeter(plane, radii[i])         
-        #layer(lname)
-        srf_id = fracture_surface(perim)
+        if perimpts and polygon: # polygon directly from perimeter vertices, no circle
+            perim_id = rs.AddPolyline(pverts[i]+[pverts[i][0]])
+            srf_id = rs.AddPlanarSrf(perim_id)
+        else:
+            plane = rs.PlaneFromNormal(centers[i], unorms[i])
+            perim, perim_id = fracture_perimeter(plane, radii[i])
+            #layer(lname)
+            srf_id = fracture_surface(perim)
         if perimpts:
-            ppts = perimeter_pts(perim_id, perimpts)
-            if polygon: # delete circle and replace by polygon, this should be optimized
-                ppts.append(ppts[0]) # close polygon
-                rs.DeleteObjects([perim_id, srf_id])
-                #layer('PERIMS')
-                perim_id = rs.AddPolyline(ppts)
-                layer(lname)
-                srf_id = rs.AddPlanarSrf(perim_id)
+            rs.AddPoints(pverts[i])
         srf_ids.append(srf_id)
         perim_ids.append(perim_id)
     return lnames, srf_ids
@@ -280,8 +329,8 @@ def fracture_centers_inside(names, radii, centers, edge_length, midpt=(0,0,0)):
     return names_i, radii_i
 
 
-def feport_json(names, radii, names_i, centers, unorms):
-    fname = 'rhino_results.json'
+def feport_json(names, radii, names_i, centers, unorms, odir=''):
+    fname = os.path.join(odir, 'rhino_results.json')
     if os.path.isfile(fname):
         with open(fname) as f:
             results = json.load(f)
@@ -304,24 +353,26 @@ def feport_json(names, radii, names_i, centers, unorms):
         f.write(json.dumps(results, indent=2, sort_keys=True))
 
 
-def freport(names, radii, centers, edge_length, unorms, midpt=(0,0,0)):
-    freport_write_single(names, radii, 'FractureNamesAndRadii.txt')
-    freport_write_triple(names, centers, 'FractureNamesAndCenters.txt')
+def freport(names, radii, centers, edge_length, unorms, midpt=(0,0,0), odir=''):
+    """Writes all reports to odir, current working directory if empty."""
+    freport_write_single(names, radii, os.path.join(odir, 'FractureNamesAndRadii.txt'))
+    freport_write_triple(names, centers, os.path.join(odir, 'FractureNamesAndCenters.txt'))
     names_i, radii_i = fracture_centers_inside(names, radii, centers, edge_length, midpt)
-    freport_write_single(names_i, radii_i, 'FractureNamesAndRadiiInside.txt')
-    feport_json(names, radii, names_i, centers, unorms)
+    freport_write_single(names_i, radii_i, os.path.join(odir, 'FractureNamesAndRadiiInside.txt'))
+    feport_json(names, radii, names_i, centers, unorms, odir)
 
 
 def save(fname='csp'):
     rs.Command('_-SaveAs Version 3 '+fname+'.3dm')
 
 
-def create_dfn(settings, seed, fname='csp'):
+def create_dfn(settings, seed, fname='csp', writer=None):
     """
     Settings:
     HL1 is half-length of outer box.
     HL2 is half-length of fracture center box.
     HL3 is half-length of inner box.
+    If a report_writer is given, reports are queued to it instead of written here.
     """
     document()
     guids, midpt = srfc_guids(), (0,0,0)
@@ -348,8 +399,13 @@ def create_dfn(settings, seed, fname='csp'):
     guids.fractures = fsrf_ids
     intersect_surfaces(guids)
     color_surfaces(fnames)
-    freport(fnames, radii, centers, settings['HL3']*2., unorms)
-    save(fname)
+    if writer is None:
+        freport(fnames, radii, centers, settings['HL3']*2., unorms)
+    else: # plain copies, rhino geometry stays on this thread
+        centers = [[c[j] for j in range(3)] for c in centers]
+        unorms = [[u[j] for j in range(3)] for u in unorms]
+        writer.put(fnames, radii, centers, settings['HL3']*2., unorms, odir=os.getcwd())
+    save(fname) # document settings, views and v3 archive as written by rhino
     #final_view()
 
 
@@ -361,15 +417,25 @@ if __name__ == '__main__':
     else:
         n, seed = settings['realizations'], settings['seed']
         bdir = os.getcwd()
-        for i in range(n):
-            os.chdir(bdir)
-            rdir = 'csp_{:0>5d}'.format(seed)
-            try:
-                os.mkdir(rdir)
-            except  OSError:
-                pass
-            os.chdir(rdir)
-            sdir = os.getcwd()
-            fname = '{0}\csp'.format(sdir)
-            create_dfn(settings, seed, fname)
-            seed += 1
\ No newline at end of file
+        writer = None
+        if settings.get('writer queue depth', 0):
+            writer = report_writer(settings['writer queue depth'])
+        try:
+            for i in range(n):
+                os.chdir(bdir)
+                rdir = 'csp_{:0>5d}'.format(seed)
+                try:
+                    os.mkdir(rdir)
+                except  OSError:
+                    pass
+                os.chdir(rdir)
+                sdir = os.getcwd()
+                fname = '{0}\csp'.format(sdir)
+                create_dfn(settings, seed, fname, writer)
+                seed += 1
+        except: # flush queued reports, keep original error
+            if writer is not None:
+                writer.close(reraise=False)
+            raise
+        if writer is not None:
+            writer.close()
\ No newline at end of file
@@ -0,0 +1,58 @@
+import math
+
+
+unit_polygons = {}
+unit_rectangle = [(1.,1.), (-1.,1.), (-1.,-1.), (1.,-1.)]
+
+
+def unit_polygon(n):
+    """Cached unit n-gon vertex table, first vertex on plane x-axis, counter-clockwise."""
+    if n not in unit_polygons:
+        unit_polygons[n] = [(math.cos(2.*math.pi*k/n), math.sin(2.*math.pi*k/n)) for k in range(n)]
+    return unit_polygons[n]
+
+
+def plane_axes(unorm):
+    """
+    Returns x and y axis of rs.PlaneFromNormal(pt, unorm) as lists,
+    x-axis as in ON_3dVector::PerpendicularTo.
+    """
+    l = math.sqrt(sum([unorm[j]**2 for j in range(3)]))
+    z = [unorm[j]/l for j in range(3)]
+    ax, ay, az = abs(z[0]), abs(z[1]), abs(z[2])
+    if ay > ax:
+        if az > ay:
+            i, j, k = 2, 1, 0
+        elif az >= ax:
+            i, j, k = 1, 2, 0
+        else:
+            i, j, k = 1, 0, 2
+    elif az > ax:
+        i, j, k = 2, 0, 1
+    elif az > ay:
+        i, j, k = 0, 2, 1
+    else:
+        i, j, k = 0, 1, 2
+    x = [0., 0., 0.]
+    x[i], x[j], x[k] = -z[j], z[i], 0.
+    l = math.sqrt(sum([x[j]**2 for j in range(3)]))
+    x = [x[j]/l for j in range(3)]
+    y = [z[1]*x[2]-z[2]*x[1], z[2]*x[0]-z[0]*x[2], z[0]*x[1]-z[1]*x[0]]
+    return x, y
+
+
+def frame_vertices(centers, sv1s, sv2s, table):
+    """Returns Nxnx3 nested list, vertex k of fracture i is centers[i]+a_k*sv1s[i]+b_k*sv2s[i]."""
+    return [[[c[j]+a*s1[j]+b*s2[j] for j in range(3)] for a, b in table]
+            for c, s1, s2 in zip(centers, sv1s, sv2s)]
+
+
+def perimeter_vertices(radii, centers, unorms, ptsno):
+    """
+    Returns ptsno equidistant perimeter vertices of all circular fractures,
+    same points as rs.DivideCurve on the fracture circle.
+    """
+    axes = [plane_axes(u) for u in unorms]
+    sv1s = [[r*x[j] for j in range(3)] for r, (x, y) in zip(radii, axes)]
+    sv2s = [[r*y[j] for j in range(3)] for r, (x, y) in zip(radii, axes)]
+    return frame_vertices(centers, sv1s, sv2s, unit_polygon(ptsno))
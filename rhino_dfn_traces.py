@@ -0,0 +1,233 @@
+import json
+import os
+import numpy as np
+from rhino_dfn_geometry import perimeter_vertices
+
+
+def unit(a):
+    a = np.asarray(a, dtype=float)
+    return a/np.sqrt(a.dot(a))
+
+
+class sampling_plane:
+    """Rectangular region of a plane, origin is midpoint, u and v orthogonal in-plane axes."""
+    def __init__(self, name, origin, u, v, hlu, hlv, tol=1e-9):
+        self.name = name
+        self.origin = np.asarray(origin, dtype=float)
+        self.u = unit(u)
+        self.v = unit(v)
+        if abs(self.u.dot(self.v)) > tol:
+            raise ValueError('axes u and v of sampling plane {0} are not orthogonal'.format(name))
+        self.normal = unit(np.cross(self.u, self.v))
+        self.hlu = float(hlu)
+        self.hlv = float(hlv)
+        if self.hlu <= 0. or self.hlv <= 0.:
+            raise ValueError('sampling plane {0} has zero area'.format(name))
+    def area(self):
+        return 4.*self.hlu*self.hlv
+
+
+def box_planes(edge_length, prefix='', midpt=(0,0,0)):
+    """Sampling planes on cube faces, same layer convention and order as cube() in rhino_dfn."""
+    hel = edge_length/2.
+    layers = ['LEFT', 'RIGHT', 'FRONT', 'BACK', 'BOTTOM', 'TOP']
+    normals = [0, 0, 1, 1, 2, 2]
+    sgns = [-1., 1., -1., 1., -1., 1.]
+    planes = []
+    for i in range(6):
+        n = normals[i]
+        origin = list(midpt)
+        origin[n] += sgns[i]*hel
+        aidcs = [j for j in range(3) if j != n]
+        u, v = [0.,0.,0.], [0.,0.,0.]
+        u[aidcs[0]], v[aidcs[1]] = 1., 1.
+        planes.append(sampling_plane(layers[i]+prefix, origin, u, v, hel, hel))
+    return planes
+
+
+def as_arrays(radii, centers, unorms):
+    """Radii, centers and unit normals as N and Nx3 float arrays."""
+    n = np.asarray(unorms, dtype=float).reshape(-1, 3)
+    return (np.asarray(radii, dtype=float).reshape(-1),
+            np.asarray(centers, dtype=float).reshape(-1, 3),
+            n/np.sqrt((n*n).sum(1))[:,None])
+
+
+def polygon_vertices(radii, centers, unorms, ptsno):
+    """Nxptsnox3 array of the ptsno-gons rhino_dfn builds with "polygon"."""
+    verts = perimeter_vertices(radii, centers, unorms, ptsno)
+    return np.asarray(verts, dtype=float).reshape(len(verts), ptsno, 3)
+
+
+def disk_segments(plane, r, c, n, tol=1e-12):
+    """Chords of disks on infinite sampling plane, returns mask of intersecting fractures and chord end points."""
+    m, o = plane.normal, plane.origin
+    d = np.cross(n, m)
+    dd = (d*d).sum(1)
+    ok = (np.abs((c-o).dot(m)) < r) & (dd >= tol) # not parallel
+    dd = np.where(ok, dd, 1.)
+    # points on plane-plane intersection lines closest to origin
+    x0 = ((n*c).sum(1)[:,None]*np.cross(m, d) + m.dot(o)*np.cross(d, n))/dd[:,None]
+    d /= np.sqrt(dd)[:,None]
+    q = x0 + d*((c-x0)*d).sum(1)[:,None]
+    h2 = ((q-c)**2).sum(1)
+    ok &= h2 < r*r
+    s = np.sqrt(np.where(ok, r*r-h2, 0.))[:,None]
+    return ok, q-d*s, q+d*s
+
+
+def polygon_segments(plane, verts):
+    """Chords of convex polygons on infinite sampling plane, returns mask of intersecting fractures and chord end points."""
+    sd0 = (verts-plane.origin).dot(plane.normal)
+    sd1 = np.roll(sd0, -1, axis=1)
+    verts1 = np.roll(verts, -1, axis=1)
+    crossing = (sd0 > 0.) != (sd1 > 0.)
+    ok = crossing.sum(1) == 2
+    rows, nv = np.arange(len(verts)), verts.shape[1]
+    pts = []
+    for k in [crossing.argmax(1), nv-1-crossing[:,::-1].argmax(1)]:
+        s0, s1 = sd0[rows,k], sd1[rows,k]
+        t = s0/np.where(crossing[rows,k], s0-s1, 1.)
+        pts.append(verts[rows,k] + t[:,None]*(verts1[rows,k]-verts[rows,k]))
+    return ok, pts[0], pts[1]
+
+
+def clip_segments(p0, p1, hlu, hlv):
+    """Liang-Barsky clip of 2d segments to [-hlu,hlu]x[-hlv,hlv], returns mask of non-empty segments and clipped end points."""
+    d = p1-p0
+    t0, t1 = np.zeros(len(d)), np.ones(len(d))
+    ok = np.ones(len(d), dtype=bool)
+    for p, q in [(-d[:,0], p0[:,0]+hlu), (d[:,0], hlu-p0[:,0]),
+                 (-d[:,1], p0[:,1]+hlv), (d[:,1], hlv-p0[:,1])]:
+        ok &= (p != 0.) | (q >= 0.)
+        t = q/np.where(p == 0., 1., p)
+        t0 = np.where(p < 0., np.maximum(t0, t), t0)
+        t1 = np.where(p > 0., np.minimum(t1, t), t1)
+    ok &= t0 < t1
+    return ok, p0+t0[:,None]*d, p0+t1[:,None]*d
+
+
+def fracture_traces(plane, radii, centers, unorms, ptsno=0):
+    """
+    Traces of fractures on sampling plane, returns arrays of fracture indices,
+    trace start and end points (3d) and trace lengths. Fractures are disks,
+    or ptsno-gons as built by rhino_dfn with "polygon" if ptsno is given.
+    """
+    r, c, n = as_arrays(radii, centers, unorms)
+    if ptsno:
+        ok, a, b = polygon_segments(plane, polygon_vertices(radii, centers, unorms, ptsno))
+    else:
+        ok, a, b = disk_segments(plane, r, c, n)
+    o, uv = plane.origin, np.array([plane.u, plane.v])
+    inside, p0, p1 = clip_segments((a-o).dot(uv.T), (b-o).dot(uv.T), plane.hlu, plane.hlv)
+    ok &= inside
+    idcs = np.nonzero(ok)[0]
+    p0, p1 = p0[idcs], p1[idcs]
+    lengths = np.sqrt(((p1-p0)**2).sum(1))
+    return idcs, o+p0.dot(uv), o+p1.dot(uv), lengths
+
+
+def trace_stats(plane, radii, centers, unorms, ptsno=0):
+    """
+    Trace map of sampling plane as numpy arrays. Angles are trace directions
+    in plane coordinates, measured from u towards v in [0, 180) degrees.
+    """
+    idcs, starts, ends, lengths = fracture_traces(plane, radii, centers, unorms, ptsno)
+    d = ends-starts
+    angles = np.degrees(np.arctan2(d.dot(plane.v), d.dot(plane.u))) % 180.
+    area = plane.area()
+    return {'fracture index': idcs,
+            'start': starts,
+            'end': ends,
+            'length': lengths,
+            'angle': angles,
+            'P20': len(idcs)/area,
+            'P21': lengths.sum()/area}
+
+
+def scanline_hits(start, end, radii, centers, unorms, ptsno=0):
+    """
+    Intersections of fractures with scanline (borehole) segment as numpy
+    arrays, fractures as in fracture_traces. Alpha is the angle between
+    scanline and fracture plane in degrees, eg for Terzaghi correction.
+    """
+    r, c, n = as_arrays(radii, centers, unorms)
+    start = np.asarray(start, dtype=float)
+    sd = np.asarray(end, dtype=float)-start
+    length = np.sqrt(sd.dot(sd))
+    if length <= 0.:
+        raise ValueError('scanline has zero length')
+    den = n.dot(sd)
+    t = ((c-start)*n).sum(1)/np.where(den == 0., 1., den)
+    ok = (den != 0.) & (t >= 0.) & (t <= 1.)
+    pts = start + t[:,None]*sd
+    if ptsno: # inside all edges, vertices counter-clockwise about n
+        verts = polygon_vertices(radii, centers, unorms, ptsno)
+        edges = np.roll(verts, -1, axis=1)-verts
+        ok &= ((np.cross(edges, pts[:,None,:]-verts)*n[:,None,:]).sum(2) >= 0.).all(1)
+    else:
+        ok &= ((pts-c)**2).sum(1) <= r*r
+    idcs = np.nonzero(ok)[0]
+    return {'fracture index': idcs,
+            'point': pts[idcs],
+            'distance': t[idcs]*length,
+            'alpha': np.degrees(np.arcsin(np.minimum(1., np.abs(den[idcs])/length))),
+            'P10': len(idcs)/length}
+
+
+def getfractures(fname='rhino_results.json'):
+    """Reads names, radii, centers and unit normals written by rhino_dfn."""
+    with open(fname, 'r') as f:
+        results = json.load(f)
+    fresults = results['fractures']
+    names = sorted(fresults)
+    return (names,
+            [fresults[n]['radius'] for n in names],
+            [fresults[n]['center'] for n in names],
+            [fresults[n]['unit normal'] for n in names])
+
+
+def settings_planes(settings):
+    """Box faces of outer and, if present, inner box plus user-defined planes."""
+    planes = box_planes(settings['HL1']*2.)
+    if settings['HL3 cube']:
+        planes += box_planes(settings['HL3']*2., '_INT')
+    for name, p in sorted(settings.get('trace planes', {}).items()):
+        planes.append(sampling_plane(name, p['origin'], p['u'], p['v'], p['hlu'], p['hlv']))
+    return planes
+
+
+def listed(stats):
+    """Stats with numpy arrays converted to lists for json."""
+    return dict((k, v.tolist() if hasattr(v, 'tolist') else v) for k, v in stats.items())
+
+
+def treport(settings, fname='rhino_traces.json'):
+    """Trace and scanline statistics of realization in current working directory."""
+    names, radii, centers, unorms = getfractures()
+    ptsno = settings['perimeter points'] if settings['polygon'] else 0
+    results = {'planes': dict(), 'scanlines': dict()}
+    for plane in settings_planes(settings):
+        stats = trace_stats(plane, radii, centers, unorms, ptsno)
+        stats['fracture'] = [names[i] for i in stats['fracture index']]
+        results['planes'][plane.name] = listed(stats)
+    for name, s in sorted(settings.get('scanlines', {}).items()):
+        stats = scanline_hits(s['start'], s['end'], radii, centers, unorms, ptsno)
+        stats['fracture'] = [names[i] for i in stats['fracture index']]
+        results['scanlines'][name] = listed(stats)
+    with open(fname, 'w') as f:
+        f.write(json.dumps(results, indent=2, sort_keys=True))
+
+
+if __name__ == '__main__':
+    with open('rhino_settings.json', 'r') as f:
+        settings = json.load(f)
+    if settings['realizations'] < 2:
+        treport(settings)
+    else:
+        n, seed = settings['realizations'], settings['seed']
+        bdir = os.getcwd()
+        for i in range(n):
+            os.chdir(os.path.join(bdir, 'csp_{:0>5d}'.format(seed+i)))
+            treport(settings)
+        os.chdir(bdir)